@@ -42,12 +42,8 @@
 
 import json
 
-# Read the JSON file
-with open('video_timings.json', 'r') as json_file:
-    video_timings = json.load(json_file)
-
-# Create the VHDL package
-vhdl_package = """
+# VHDL package header, filled in with the highest VIC once all records are known
+vhdl_header = """
 library IEEE;
 use IEEE.STD_LOGIC_1164.ALL;
 
@@ -76,35 +72,48 @@ package video_timings_pkg is
 
     constant video_timings : video_timings_a := (
     --  VIC    |  Name              | VIC | Pixel Clk kHz | interlaced | double clocked | hactive | vactive | hfront | hsync | hback | hpol | vfront | vsync | vback | vpol | ln
-""".format(max_index=max([mode['vic'] for mode in video_timings]))
+"""
+
+# Default for all unused VICs, the closing parenthesis and the end of the package
+vhdl_trailer = "\n     others => (\"--------------------\",    0,              0,       false,           false,        0,        0,       0,      0,      0,   '0',       0,      0,      0,   '0',  0 )\n    );\nend package video_timings_pkg;\n"
 
-# Add the records to the array
-for mode in video_timings:
-    vhdl_package += """
-        {vic:>3} => ("{name:<20}", {vic:>4}, {pxl_clk_khz:>14}, {interlaced:>11}, {dbl_clkd:>15}, {hactive:>8}, {vactive:>8}, {hfront:>7}, {hsync:>6}, {hback:>6},   '{hpol}', {vfront:>7}, {vsync:>6}, {vback:>6},   '{vpol}',  {ln} ),""".format(
-        vic=mode['vic'],
-        name=mode['name'],
-        pxl_clk_khz=mode['pxl_clk_khz'],
-        interlaced=str(mode['interlaced']).lower(),
-        dbl_clkd=str(mode['double_clocked']).lower(),
-        hactive=mode['hactive'],
-        vactive=mode['vactive'],
-        hfront=mode['hfront'],
-        hsync=mode['hsync'],
-        hback=mode['hback'],
-        hpol=mode['hpol'],
-        vfront=mode['vfront'],
-        vsync=mode['vsync'],
-        vback=mode['vback'],
-        vpol=mode['vpol'],
+def main():
+    # Read the JSON file
+    with open('video_timings.json', 'r') as json_file:
+        video_timings = json.load(json_file)
+
+    # Add the records to the array and track the highest VIC on the way
+    parts = []
+    max_index = 0
+    for mode in video_timings:
+        vic = mode['vic']
+        name = mode['name']
+        pxl_clk_khz = mode['pxl_clk_khz']
+        interlaced = 'true' if mode['interlaced'] else 'false'
+        dbl_clkd = 'true' if mode['double_clocked'] else 'false'
+        hactive = mode['hactive']
+        vactive = mode['vactive']
+        hfront = mode['hfront']
+        hsync = mode['hsync']
+        hback = mode['hback']
+        hpol = mode['hpol']
+        vfront = mode['vfront']
+        vsync = mode['vsync']
+        vback = mode['vback']
+        vpol = mode['vpol']
         ln = mode['ln']
-    )
+        if vic > max_index:
+            max_index = vic
+        parts.append(f"\n        {vic:>3} => (\"{name:<20}\", {vic:>4}, {pxl_clk_khz:>14}, {interlaced:>11}, {dbl_clkd:>15}, {hactive:>8}, {vactive:>8}, {hfront:>7}, {hsync:>6}, {hback:>6},   '{hpol}', {vfront:>7}, {vsync:>6}, {vback:>6},   '{vpol}',  {ln} ),")
+
+    # Assemble the package from header, records and trailer
+    vhdl_package = vhdl_header.format(max_index=max_index) + "".join(parts) + vhdl_trailer
 
-# Remove the last comma and add the closing parenthesis
-vhdl_package += "\n     others => (\"--------------------\",    0,              0,       false,           false,        0,        0,       0,      0,      0,   '0',       0,      0,      0,   '0',  0 )\n    );\nend package video_timings_pkg;\n"
+    # Write the VHDL package to a file
+    with open('video_timings_pkg.vhdl', 'w') as vhdl_file:
+        vhdl_file.write(vhdl_package)
 
-# Write the VHDL package to a file
-with open('video_timings_pkg.vhdl', 'w') as vhdl_file:
-    vhdl_file.write(vhdl_package)
+    print("VHDL package created successfully!")
 
-print("VHDL package created successfully!")
+if __name__ == "__main__":
+    main()
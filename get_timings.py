@@ -10,8 +10,8 @@
 #       contained in the kernel sources and is hardcoded here for the modes where
 #       it is different from 1.
 # Usage:
-#   1. Run the script using Python 3. The script will generate a JSON file
-#      video_timings.json
+#   1. Run the script using Python 3 (CPython or PyPy, e.g. pypy3 get_timings.py).
+#      The script will generate a JSON file video_timings.json
 # -----------------------------------------------------------------------------
 # Example JSON file format (video_timings.json):
 # [
@@ -42,143 +42,183 @@
 # -----------------------------------------------------------------------------
 
 import json
+import re
 import requests
 
 # List of array names to include
-arrays_to_include = ["edid_cea_modes_1", "edid_cea_modes_193"]
+arrays_to_include = frozenset(("edid_cea_modes_1", "edid_cea_modes_193"))
 
 # Ln numbers, see CTA-861-I / Table 1. Those numbers are not contained in the linux kernel sources
 # The ln field is 1 in most cases. Except view exceptions which are hardcoded here.
-ln4 = [6,7,8,9,10,11,12,13,50,51,58,59]
-ln7 = [2,3,14,15,35,36,48,49,56,57]
+ln4 = frozenset((6,7,8,9,10,11,12,13,50,51,58,59))
+ln7 = frozenset((2,3,14,15,35,36,48,49,56,57))
+
+# Flags known to be used in the DRM_MODE initializers of the CTA-861 modes.
+# Bit values as in include/uapi/drm/drm_mode.h
+DRM_MODE_FLAG_PHSYNC = 1<<0
+DRM_MODE_FLAG_NHSYNC = 1<<1
+DRM_MODE_FLAG_PVSYNC = 1<<2
+DRM_MODE_FLAG_NVSYNC = 1<<3
+DRM_MODE_FLAG_INTERLACE = 1<<4
+DRM_MODE_FLAG_DBLCLK = 1<<12
+flag_bits = {
+    "DRM_MODE_FLAG_PHSYNC": DRM_MODE_FLAG_PHSYNC,
+    "DRM_MODE_FLAG_NHSYNC": DRM_MODE_FLAG_NHSYNC,
+    "DRM_MODE_FLAG_PVSYNC": DRM_MODE_FLAG_PVSYNC,
+    "DRM_MODE_FLAG_NVSYNC": DRM_MODE_FLAG_NVSYNC,
+    "DRM_MODE_FLAG_INTERLACE": DRM_MODE_FLAG_INTERLACE,
+    "DRM_MODE_FLAG_DBLCLK": DRM_MODE_FLAG_DBLCLK
+}
+hsync_mask = DRM_MODE_FLAG_PHSYNC | DRM_MODE_FLAG_NHSYNC
+vsync_mask = DRM_MODE_FLAG_PVSYNC | DRM_MODE_FLAG_NVSYNC
+# there must always be exactly one flag for the sync polarity for each dimension
+hsync_legal = frozenset((DRM_MODE_FLAG_PHSYNC, DRM_MODE_FLAG_NHSYNC))
+vsync_legal = frozenset((DRM_MODE_FLAG_PVSYNC, DRM_MODE_FLAG_NVSYNC))
 
 # URL to drm_edid.c
 url = 'https://raw.githubusercontent.com/torvalds/linux/refs/heads/master/drivers/gpu/drm/drm_edid.c'
 
+# Patterns for the three parts of a mode entry, e.g.
+#   /* 6 - 720(1440)x480i@60Hz 4:3 */
+#   { DRM_MODE("720x480i", DRM_MODE_TYPE_DRIVER, 13500, 720, 739, 801, 858, 0, 480, 488, 494, 525, 0,
+#              DRM_MODE_FLAG_NHSYNC | DRM_MODE_FLAG_NVSYNC | DRM_MODE_FLAG_INTERLACE | DRM_MODE_FLAG_DBLCLK),
+#     .picture_aspect_ratio = HDMI_PICTURE_ASPECT_4_3, },
+comment_re = re.compile(r'/\*\s*(\d+)\s*-\s*((\d+)(?:\(\s*(\d+)\s*\))?x(\d+)(i?)@\s*([\d.]+)\s*Hz)\s+(\d+)\s*:\s*(\d+)\s*\*/')
+macro_re = re.compile(r'\*/\s*\{\s*DRM_MODE\(\s*"((\d+)x(\d+)(i?))"\s*,\s*(\w+)\s*,' + r'\s*(\d+)\s*,' * 11 + r'([\w\s|]+)\)')
+aspect_re = re.compile(r'\.picture_aspect_ratio\s*=\s*HDMI_PICTURE_ASPECT_(\d+)_(\d+)')
+
 def get_ln(vic):
     if vic in ln4: return 4
     if vic in ln7: return 7
     return 1
 
+# Computes the blanking, porch and sync widths as well as the frame rate of a
+# mode from the DRM_MODE initializer parameters
+def calc_timings(clock, hdisplay, hsync_start, hsync_end, htotal, vdisplay, vsync_start, vsync_end, vtotal, interlaced):
+    fps = (clock*1000)/(vtotal*htotal)
+    if interlaced: fps *= 2
+    return (htotal - hdisplay, hsync_start - hdisplay, hsync_end - hsync_start, htotal - hsync_end,
+            vtotal - vdisplay, vsync_start - vdisplay, vsync_end - vsync_start, vtotal - vsync_end,
+            fps)
+
 # Function to parse the C file and extract video modes
 def parse_mode_string(mode_string):
 
     # Split into 3 parts
-    comment = mode_string.split('/*')[1].split('*/')[0].strip()
-    macro = mode_string.split('*/')[1].split("(",1)[1].rsplit(')')[0].strip()
-    aspect_elmnt = mode_string.split(".picture_aspect_ratio")[1].split(',')[0].strip()
+    comment = comment_re.search(mode_string)
+    assert comment, f"Cannot parse comment of mode: {mode_string}"
+    macro = macro_re.search(mode_string)
+    assert macro, f"Cannot parse DRM_MODE initializer of mode: {mode_string}"
+    aspect = aspect_re.search(mode_string)
+    assert aspect, f"Cannot parse aspect ratio of mode: {mode_string}"
 
     # parse comment
-    cmnt_cta861_id = int(comment.split('-')[0].strip())
-    cmnt_name = comment.split('-')[1].strip().split(' ')[0].strip()
-    cmnt_freq = cmnt_name.split('@')[1].split('Hz')[0].strip()
-    cmnt_hres_str = cmnt_name.split('x')[0]
-    if '(' in cmnt_hres_str:
-        cmnt_dbl_clocked = True
-        cmnt_hres = int(cmnt_hres_str.split('(')[0])
-        cmnt_dbl_hres = int(cmnt_hres_str.split('(')[1].split(')')[0].strip())
-    else:
-        cmnt_dbl_clocked = False
-        cmnt_hres = int(cmnt_hres_str)
-        cmnt_dbl_hres = None
-    cmnt_vres_str = cmnt_name.split('x')[1].split('@')[0].strip()
-    if cmnt_vres_str.endswith('i'):
-        cmnt_interlaced = True
-        cmnt_vres = int(cmnt_vres_str[:-1])
-    else:
-        cmnt_interlaced = False
-        cmnt_vres = int(cmnt_vres_str)
-    cmnt_aspect_ratio = comment.split('-')[1].strip().split(' ')[1].strip()
-    cmnt_aspect_nom = int(cmnt_aspect_ratio.split(':')[0].strip())
-    cmnt_aspect_denom = int(cmnt_aspect_ratio.split(':')[1].strip())
+    cmnt_cta861_id, cmnt_name, cmnt_hres, cmnt_dbl_hres, cmnt_vres, cmnt_interlaced, cmnt_freq, cmnt_aspect_nom, cmnt_aspect_denom = comment.groups()
+    cmnt_cta861_id = int(cmnt_cta861_id)
+    cmnt_hres = int(cmnt_hres)
+    cmnt_dbl_clocked = cmnt_dbl_hres is not None
+    cmnt_dbl_hres = int(cmnt_dbl_hres) if cmnt_dbl_clocked else None
+    cmnt_vres = int(cmnt_vres)
+    cmnt_interlaced = cmnt_interlaced == 'i'
+    cmnt_aspect_nom = int(cmnt_aspect_nom)
+    cmnt_aspect_denom = int(cmnt_aspect_denom)
 
     # parse macro parameters
-    mac_name, mac_type, mac_clock, mac_hdisplay, mac_hsync_start, mac_hsync_end, mac_htotal, mac_hskew, mac_vdisplay, mac_vsync_start, mac_vsync_end, mac_vtotal, mac_vscan, mac_flags = macro.replace(" ","").split(",")
-    mac_flags = [x.strip() for x in mac_flags.split('|')]
-    mac_dbl_clk = "DRM_MODE_FLAG_DBLCLK" in mac_flags
-    mac_interlaced = "DRM_MODE_FLAG_INTERLACE" in mac_flags
-    mac_hsync_neg = "DRM_MODE_FLAG_NHSYNC" in mac_flags
-    mac_vsync_neg = "DRM_MODE_FLAG_NVSYNC" in mac_flags
-    mac_name = mac_name.replace("\"","")
-    mac_name_hres = int(mac_name.split('x')[0])
-    if 'i' in mac_name:
-        mac_name_interlaced = True
-        mac_name_vres = int(mac_name.split('x')[1][:-1])
-    else:
-        mac_name_interlaced = False
-        mac_name_vres = int(mac_name.split('x')[1])
+    mac_groups = macro.groups()
+    mac_name, mac_name_hres, mac_name_vres, mac_name_interlaced, mac_type = mac_groups[:5]
+    mac_clock, mac_hdisplay, mac_hsync_start, mac_hsync_end, mac_htotal, mac_hskew, mac_vdisplay, mac_vsync_start, mac_vsync_end, mac_vtotal, mac_vscan = map(int, mac_groups[5:16])
+    mac_flags = mac_groups[16]
+    mac_name_hres = int(mac_name_hres)
+    mac_name_vres = int(mac_name_vres)
+    mac_name_interlaced = mac_name_interlaced == 'i'
+    flags = 0
+    for flag in mac_flags.split('|'):
+        flag = flag.strip()
+        bit = flag_bits.get(flag)
+        # check for unkown flags
+        assert bit, f"Unknown flag for mode {cmnt_name}: {flag}"
+        flags |= bit
+    mac_dbl_clk = bool(flags & DRM_MODE_FLAG_DBLCLK)
+    mac_interlaced = bool(flags & DRM_MODE_FLAG_INTERLACE)
+    mac_hsync_neg = bool(flags & DRM_MODE_FLAG_NHSYNC)
+    mac_vsync_neg = bool(flags & DRM_MODE_FLAG_NVSYNC)
 
     # parse aspect ratio
-    aspect_nom = int(aspect_elmnt.rsplit('_',2)[1])
-    aspect_denom = int(aspect_elmnt.rsplit('_',2)[2])
+    aspect_nom, aspect_denom = map(int, aspect.groups())
+
+    # derived timing parameters
+    hblank, hfront, hsync, hback, vblank, vfront, vsync, vback, fps_calc = calc_timings(
+        mac_clock, mac_hdisplay, mac_hsync_start, mac_hsync_end, mac_htotal,
+        mac_vdisplay, mac_vsync_start, mac_vsync_end, mac_vtotal, mac_interlaced)
 
     # Check for consistency
-    # check for unkown flags
-    flags_avail = {"DRM_MODE_FLAG_DBLCLK","DRM_MODE_FLAG_INTERLACE","DRM_MODE_FLAG_NHSYNC","DRM_MODE_FLAG_NVSYNC","DRM_MODE_FLAG_PHSYNC","DRM_MODE_FLAG_PVSYNC"}
-    assert not set(mac_flags)-flags_avail, f"Unknown flags for mode {cmnt_name}: {flags_avail-set(mac_flags)}"
     # there must always be one flag for the sync polarity for each dimension
-    assert len({"DRM_MODE_FLAG_NHSYNC","DRM_MODE_FLAG_PHSYNC"} & set(mac_flags)) == 1, f"Illegal flag combination for mode {cmnt_name}: {mac_flags}"
-    assert len({"DRM_MODE_FLAG_NVSYNC","DRM_MODE_FLAG_PVSYNC"} & set(mac_flags)) == 1, f"Illegal flag combination for mode {cmnt_name}: {mac_flags}"
+    assert (flags & hsync_mask) in hsync_legal, f"Illegal flag combination for mode {cmnt_name}: {mac_flags}"
+    assert (flags & vsync_mask) in vsync_legal, f"Illegal flag combination for mode {cmnt_name}: {mac_flags}"
     if mac_interlaced:
         assert mac_name_interlaced, f"In mode {cmnt_name}, interlaced flag is set but no \"i\" in resolution string of mode name"
         assert cmnt_interlaced, f"In mode {cmnt_name}, interlaced flag is set but no \"i\" in resolution string of comment"
     if mac_dbl_clk:
         assert cmnt_dbl_clocked, f"In mode {cmnt_name}, double clocking flag is set but resolution string in comment does not indicate double clocking"
         assert 2*cmnt_hres == cmnt_dbl_hres, f"In mode {cmnt_name}, double clocked resolution is not twice the actual resolution"
-    assert int(mac_hdisplay) == cmnt_hres, f"In mode {cmnt_name}, parsed horizontal resolution does not macht the one in the name of the mode (comment)"
+    assert mac_hdisplay == cmnt_hres, f"In mode {cmnt_name}, parsed horizontal resolution does not macht the one in the name of the mode (comment)"
     assert mac_name_hres == cmnt_hres, f"In mode {cmnt_name}, parsed horizontal resolution does not macht the one in the name of the mode"
-    assert int(mac_vdisplay) == cmnt_vres, f"In mode {cmnt_name}, parsed vertical resolution does not macht the one in the name of the mode (comment)"
+    assert mac_vdisplay == cmnt_vres, f"In mode {cmnt_name}, parsed vertical resolution does not macht the one in the name of the mode (comment)"
     assert mac_name_vres == cmnt_vres, f"In mode {cmnt_name}, parsed vertical resolution does not macht the one in the name of the mode"
     assert aspect_nom == cmnt_aspect_nom, f"Different values for aspect ratio in comment and initializer for mode {cmnt_name}."
     assert aspect_denom == cmnt_aspect_denom, f"Different values for aspect ratio in comment and initializer for mode {cmnt_name}."
     assert mac_type == "DRM_MODE_TYPE_DRIVER", f"Unknown type for mode {cmnt_name}"
-    assert int(mac_hskew) == 0, f"For mode {cmnt_name} hskew is set to {mac_hskew}. Expecting 0 for all modes"
-    assert int(mac_vscan) == 0, f"For mode {cmnt_name} vscan is set to {mac_hskew}. Expecting 0 for all modes"
-    fps_calc = float(int(mac_clock)*1000)/float(int(mac_vtotal)*int(mac_htotal))
-    if mac_interlaced: fps_calc = fps_calc * 2
-    if (fps_calc != float(cmnt_freq)):
-        if abs(float(cmnt_freq)-fps_calc) < 0.005*float(cmnt_freq):
+    assert mac_hskew == 0, f"For mode {cmnt_name} hskew is set to {mac_hskew}. Expecting 0 for all modes"
+    assert mac_vscan == 0, f"For mode {cmnt_name} vscan is set to {mac_hskew}. Expecting 0 for all modes"
+    cmnt_freq_f = float(cmnt_freq)
+    if fps_calc != cmnt_freq_f:
+        if abs(cmnt_freq_f-fps_calc) < 0.005*cmnt_freq_f:
             print(f"Warning: For mode {cmnt_name}, indicated fps frequency in comment is {cmnt_freq}, but computed on paramters is {fps_calc}. This is within the 0.5% tolerance.")
         else:
             assert False, (f"For mode {cmnt_name}, indicated fps frequency in comment is {cmnt_freq}, but computed on paramters is {fps_calc}. This is outside of the 0.5% tolerance.")
 
     mode = {
-        "vic": int(cmnt_cta861_id),
-        "name": str(mac_name) +"@" + str(cmnt_freq) + "Hz",
-        "pxl_clk_khz" : int(mac_clock),
-        "hactive": int(mac_hdisplay),
-        "vactive": int(mac_vdisplay),
+        "vic": cmnt_cta861_id,
+        "name": mac_name + "@" + cmnt_freq + "Hz",
+        "pxl_clk_khz" : mac_clock,
+        "hactive": mac_hdisplay,
+        "vactive": mac_vdisplay,
         "interlaced": mac_interlaced,
         "double_clocked": mac_dbl_clk,
-        "htotal": int(mac_htotal),
-        "hblank": int(mac_htotal) - int(mac_hdisplay),
-        "hfront": int(mac_hsync_start) - int(mac_hdisplay),
-        "hsync": int(mac_hsync_end) - int(mac_hsync_start),
-        "hback": int(mac_htotal) - int(mac_hsync_end),
+        "htotal": mac_htotal,
+        "hblank": hblank,
+        "hfront": hfront,
+        "hsync": hsync,
+        "hback": hback,
         "hpol": 0 if mac_hsync_neg else 1,
-        "vtotal": int(mac_vtotal),
-        "vblank": int(mac_vtotal) - int(mac_vdisplay),
-        "vfront": int(mac_vsync_start) - int(mac_vdisplay),
-        "vsync": int(mac_vsync_end) - int(mac_vsync_start),
-        "vback": int(mac_vtotal) - int(mac_vsync_end),
+        "vtotal": mac_vtotal,
+        "vblank": vblank,
+        "vfront": vfront,
+        "vsync": vsync,
+        "vback": vback,
         "vpol": 0 if mac_vsync_neg else 1,
-        "ln" : get_ln(int(cmnt_cta861_id))
+        "ln" : get_ln(cmnt_cta861_id)
     }
 
     return mode
 
 
 # Function to parse the C file and extract video modes
-def parse_c_file(file_content, arrays_to_include):
+# lines can be any iterable of str, e.g. the lines of a streamed response
+def parse_c_file(lines, arrays_to_include):
     video_modes = []
-    lines = file_content.split('\n')
+    arrays_to_include = frozenset(arrays_to_include)
 
     current_array = None
     for line in lines:
+        # Outside of the arrays of interest only the array declarations matter.
+        # Skip everything else before doing any further work on the line
+        if current_array is None and "static const struct drm_display_mode" not in line:
+            continue
         line = line.strip()
         if line.startswith("};"):
             current_array = None
-            mode_string = None
+            mode_lines = None
             continue
         if line.startswith("static const struct drm_display_mode"):
             array_name = line.split()[4].split('[')[0].strip()
@@ -187,25 +227,29 @@ def parse_c_file(file_content, arrays_to_include):
                 continue
         if current_array:
             if line.startswith("/*"):
-                mode_string = line
+                mode_lines = [line]
             else:
-                mode_string += line
+                mode_lines.append(line)
             if line.endswith("},"):
-                video_modes.append(parse_mode_string(mode_string))
+                video_modes.append(parse_mode_string("".join(mode_lines)))
 
     return video_modes
 
-# Fetch the C file content from the URL
-response = requests.get(url)
-file_content = response.text
+def main():
+    # Fetch the C file from the URL and parse it line by line while it is received
+    with requests.get(url, stream=True) as response:
+        response.raise_for_status()
+        response.encoding = response.encoding or 'utf-8'
+        video_modes = parse_c_file(response.iter_lines(decode_unicode=True), arrays_to_include)
 
-# Parse the C file and get the video modes
-video_modes = parse_c_file(file_content, arrays_to_include)
+    print(f"{len(video_modes)} video modes parsed.")
 
-print(f"{len(video_modes)} video modes parsed.")
+    # Write the data to a JSON file. Serialize in one go, json.dump would issue a
+    # separate write for every token.
+    with open('video_timings.json', 'w') as json_file:
+        json_file.write(json.dumps(video_modes, indent=4))
 
-# Write the data to a JSON file
-with open('video_timings.json', 'w') as json_file:
-    json.dump(video_modes, json_file, indent=4)
+    print("JSON file created successfully!")
 
-print("JSON file created successfully!")
+if __name__ == "__main__":
+    main()